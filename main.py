@@ -1,8 +1,12 @@
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
+import logging
 import os
+import orjson
 from dotenv import load_dotenv
 
 from models import RecipeRequest, RecipeResponse, ErrorResponse
@@ -12,6 +16,8 @@ from services.storage_service import StorageService
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger("axium")
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Smart Recipe Analyzer",
@@ -28,21 +34,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-recipe_service = RecipeService()
+# Initialize services (recipe generation logs through the same storage instance)
 storage_service = StorageService()
+recipe_service = RecipeService(storage=storage_service)
+
+@app.on_event("startup")
+async def start_storage_flusher():
+    """Start batching interaction writes in the background"""
+    storage_service.start_flusher()
+
+@app.on_event("shutdown")
+async def stop_storage_flusher():
+    """Write out any interactions still queued"""
+    await storage_service.stop_flusher()
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# The main page never changes while the server runs, so read it once
+try:
+    with open("templates/index.html", "rb") as f:
+        _INDEX_HTML = f.read()
+except FileNotFoundError:
+    _INDEX_HTML = b"<h1>Smart Recipe Analyzer</h1><p>templates/index.html not found</p>"
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     """Serve the main HTML page"""
-    try:
-        with open("templates/index.html", "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read())
-    except FileNotFoundError:
-        return HTMLResponse(content="<h1>Smart Recipe Analyzer</h1><p>templates/index.html not found</p>")
+    return HTMLResponse(content=_INDEX_HTML)
 
 @app.get("/health")
 async def health_check():
@@ -58,27 +77,12 @@ async def api_health_check():
 async def generate_recipes(request: RecipeRequest):
     """Generate recipes based on available ingredients"""
     try:
-        # Log the incoming request
-        print(f"🔍 Backend - Received request: {request}")
-        print(f"📥 Backend - Ingredients received: {request.ingredients}")
-        print(f"📊 Backend - Request type: {type(request)}")
-        print(f"📋 Backend - Request dict: {request.dict()}")
+        # Log the incoming request (arguments are only formatted when DEBUG is on)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("recipe request: %s", request.ingredients)
         
-        # Validate ingredients
-        is_valid, error_message = recipe_service.validate_ingredients(request.ingredients)
-        if not is_valid:
-            raise HTTPException(status_code=400, detail=error_message)
-        
-        # Sanitize ingredients
-        sanitized_ingredients = recipe_service.sanitize_ingredients(request.ingredients)
-        if not sanitized_ingredients:
-            raise HTTPException(status_code=400, detail="No valid ingredients found after sanitization")
-        
-        # Create new request with sanitized ingredients
-        sanitized_request = RecipeRequest(ingredients=sanitized_ingredients)
-        
-        # Generate recipes
-        response = await recipe_service.generate_recipes_from_ingredients(sanitized_request)
+        # Generate recipes (ingredients are already normalized by RecipeRequest)
+        response = await recipe_service.generate_recipes_from_ingredients(request)
         
         if not response.success:
             raise HTTPException(status_code=500, detail=response.message)
@@ -90,33 +94,35 @@ async def generate_recipes(request: RecipeRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+# The sample payload is constant, so serialize it once at import
+_SAMPLE_RECIPES = [
+    {
+        "name": "Sample Pasta Dish",
+        "ingredients": ["pasta", "garlic", "olive oil", "parmesan"],
+        "instructions": [
+            "Boil pasta according to package instructions",
+            "Sauté minced garlic in olive oil",
+            "Toss pasta with garlic oil and parmesan"
+        ],
+        "cookingTime": "15 minutes",
+        "difficulty": "Easy",
+        "nutrition": {
+            "calories": 400,
+            "protein": "12g",
+            "carbs": "65g"
+        }
+    }
+]
+_SAMPLE_JSON = orjson.dumps({
+    "recipes": _SAMPLE_RECIPES,
+    "success": True,
+    "message": "Sample recipe for testing purposes"
+})
+
 @app.get("/api/recipes/sample")
 async def get_sample_recipes():
     """Get sample recipes for testing (doesn't require API key)"""
-    sample_recipes = [
-        {
-            "name": "Sample Pasta Dish",
-            "ingredients": ["pasta", "garlic", "olive oil", "parmesan"],
-            "instructions": [
-                "Boil pasta according to package instructions",
-                "Sauté minced garlic in olive oil",
-                "Toss pasta with garlic oil and parmesan"
-            ],
-            "cookingTime": "15 minutes",
-            "difficulty": "Easy",
-            "nutrition": {
-                "calories": 400,
-                "protein": "12g",
-                "carbs": "65g"
-            }
-        }
-    ]
-    
-    return RecipeResponse(
-        recipes=sample_recipes,
-        success=True,
-        message="Sample recipe for testing purposes"
-    )
+    return Response(content=_SAMPLE_JSON, media_type="application/json")
 
 @app.get("/api/interactions/all")
 async def get_all_interactions():
@@ -160,11 +166,25 @@ async def not_found_handler(request: Request, exc: HTTPException):
         content={"error": "Endpoint not found", "path": request.url.path}
     )
 
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    """Report invalid recipe requests as a 400 with a plain-text detail for the frontend"""
+    if request.url.path != "/api/recipes/generate":
+        return await request_validation_exception_handler(request, exc)
+    from fastapi.responses import JSONResponse
+    error = exc.errors()[0]
+    # Prefer the validator's own message over Pydantic's "Value error, ..." wrapper
+    cause = error.get("ctx", {}).get("error")
+    return JSONResponse(
+        status_code=400,
+        content={"detail": str(cause) if cause is not None else error["msg"]}
+    )
+
 @app.exception_handler(500)
 async def internal_error_handler(request: Request, exc: Exception):
     """Handle 500 errors"""
     from fastapi.responses import JSONResponse
-    error_detail = str(exc) if hasattr(exc, '__str__') else "Unknown error"
+    error_detail = str(exc)
     return JSONResponse(
         status_code=500,
         content={"error": "Internal server error", "detail": error_detail}
@@ -174,7 +194,7 @@ async def internal_error_handler(request: Request, exc: Exception):
 async def general_exception_handler(request: Request, exc: Exception):
     """Handle any other exceptions"""
     from fastapi.responses import JSONResponse
-    error_detail = str(exc) if hasattr(exc, '__str__') else "Unknown error"
+    error_detail = str(exc)
     return JSONResponse(
         status_code=500,
         content={"error": "Unexpected error", "detail": error_detail}
@@ -188,10 +208,15 @@ if __name__ == "__main__":
         print("Warning: gemini_key not found in environment variables")
         print("The application will start but recipe generation will fail")
     
-    # Run the application
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True
-    )
+    # Run the application; the reloader only runs in development and cannot
+    # be combined with multiple workers. uvicorn[standard] ships uvloop and
+    # httptools, which uvicorn picks up automatically where available.
+    if os.getenv('ENV') == 'development':
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    else:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=max(2, (os.cpu_count() or 1) * 2 + 1)
+        )
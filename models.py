@@ -1,17 +1,27 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import List, Optional
 
 class RecipeRequest(BaseModel):
     """Request model for recipe generation"""
+    model_config = ConfigDict(frozen=True)
+    
     ingredients: List[str] = Field(..., description="List of available ingredients")
     
-    @validator('ingredients')
-    def validate_ingredients(cls, v):
-        if not v:
-            raise ValueError('Ingredients list cannot be empty')
-        if len(v) < 1:
-            raise ValueError('At least one ingredient is required')
-        return [ingredient.strip().lower() for ingredient in v if ingredient.strip()]
+    @field_validator('ingredients', mode='after')
+    @classmethod
+    def validate_ingredients(cls, v: List[str]) -> List[str]:
+        """Strip, lowercase and length-check ingredients in a single pass"""
+        sanitized = []
+        for ingredient in v:
+            cleaned = ingredient.strip().lower()
+            if not cleaned:
+                continue
+            if len(cleaned) > 100:
+                raise ValueError(f"Ingredient '{ingredient}' is too long")
+            sanitized.append(cleaned)
+        if not sanitized:
+            raise ValueError('At least one non-empty ingredient is required')
+        return sanitized
 
 class NutritionInfo(BaseModel):
     """Nutritional information for a recipe"""
@@ -1,37 +1,93 @@
+import logging
 import os
+import re
 import json
+import orjson
 import google.generativeai as genai
-from typing import List, Dict, Any
-from models import Recipe, RecipeResponse, ErrorResponse
+from typing import List, Dict, Any, Optional
+from models import Recipe, NutritionInfo, RecipeResponse, ErrorResponse
 from services.storage_service import StorageService
 
+logger = logging.getLogger("axium")
+
+# Field names resolved once; recipes are built from exactly these keys
+_RECIPE_FIELDS = tuple(Recipe.model_fields)
+# Recipe fields checked by type before building without validation
+_RECIPE_STR_FIELDS = ("name", "cookingTime", "difficulty")
+_RECIPE_LIST_FIELDS = ("ingredients", "instructions")
+
+def _has_recipe_shape(recipe_data: Any) -> bool:
+    """Cheaply check that top-level recipe fields have the types Recipe declares"""
+    if not isinstance(recipe_data, dict):
+        return False
+    for field in _RECIPE_STR_FIELDS:
+        if not isinstance(recipe_data.get(field), str):
+            return False
+    for field in _RECIPE_LIST_FIELDS:
+        value = recipe_data.get(field)
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            return False
+    return isinstance(recipe_data.get("nutrition"), dict)
+
+# Extracts the JSON object from a ```json fenced block in a single scan
+_FENCE_RE = re.compile(r"```(?:json)?\s*(\{.*\})\s*```", re.DOTALL)
+
+# Static recipe prompt; only the ingredient list is filled in per request
+_PROMPT_TEMPLATE = """
+Generate 2-3 creative recipe suggestions using these ingredients: {ingredients}
+
+Requirements:
+- Each recipe must use the provided ingredients as primary components
+- Include estimated cooking time and difficulty level
+- Provide realistic nutritional information (calories, protein, carbs)
+- Format response as valid JSON only
+- Be creative but practical with cooking instructions
+
+Response format (return ONLY valid JSON):
+{{
+  "recipes": [
+    {{
+      "name": "Recipe Name",
+      "ingredients": ["ingredient1", "ingredient2", "additional_ingredients_needed"],
+      "instructions": ["step1", "step2", "step3"],
+      "cookingTime": "X minutes",
+      "difficulty": "Easy/Medium/Hard",
+      "nutrition": {{
+        "calories": X,
+        "protein": "Xg",
+        "carbs": "Xg"
+      }}
+    }}
+  ]
+}}
+
+Important: Return ONLY the JSON response, no additional text or explanations.
+"""
+
 class GeminiService:
     """Service for interacting with Google Gemini AI"""
     
-    def __init__(self):
+    def __init__(self, storage: Optional[StorageService] = None):
         api_key = os.getenv('gemini_key')
         if not api_key:
             raise ValueError("gemini_key environment variable is required")
         
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel('gemini-2.0-flash')
-        self.storage = StorageService()
+        self.storage = storage if storage is not None else StorageService()
         
     def generate_recipes(self, ingredients: List[str]) -> RecipeResponse:
         """Generate recipes using Gemini AI based on available ingredients"""
         try:
             # Log the ingredients being sent to Gemini
-            print(f"🔍 GeminiService - Ingredients to process: {ingredients}")
-            print(f"📊 GeminiService - Ingredients type: {type(ingredients)}")
+            logger.debug("Ingredients to process: %s", ingredients)
             
             # Create structured prompt for consistent JSON output
             prompt = self._create_recipe_prompt(ingredients)
             
             # Generate response from Gemini
-            print(f"📤 GeminiService - Sending prompt to Gemini...")
             response = self.model.generate_content(prompt)
-            print(f"📥 GeminiService - Raw response from Gemini: {response.text}")
-            print(f"📊 GeminiService - Response type: {type(response.text)}")
+            logger.debug("Raw response from Gemini: %s", response.text)
             
             # Parse and validate the response
             recipes = self._parse_ai_response(response.text)
@@ -44,7 +100,7 @@ class GeminiService:
                 success=True
             )
             
-            print(f"💾 GeminiService - Stored interaction {interaction_id}")
+            logger.debug("Stored interaction %s", interaction_id)
             
             return RecipeResponse(
                 recipes=recipes,
@@ -62,7 +118,7 @@ class GeminiService:
                 error_message=str(e)
             )
             
-            print(f"💾 GeminiService - Stored failed interaction {interaction_id}")
+            logger.debug("Stored failed interaction %s", interaction_id)
             
             # Return error response if something goes wrong
             return RecipeResponse(
@@ -73,77 +129,42 @@ class GeminiService:
     
     def _create_recipe_prompt(self, ingredients: List[str]) -> str:
         """Create a structured prompt for recipe generation"""
-        ingredients_str = ", ".join(ingredients)
-        
-        prompt = f"""
-Generate 2-3 creative recipe suggestions using these ingredients: {ingredients_str}
-
-Requirements:
-- Each recipe must use the provided ingredients as primary components
-- Include estimated cooking time and difficulty level
-- Provide realistic nutritional information (calories, protein, carbs)
-- Format response as valid JSON only
-- Be creative but practical with cooking instructions
-
-Response format (return ONLY valid JSON):
-{{
-  "recipes": [
-    {{
-      "name": "Recipe Name",
-      "ingredients": ["ingredient1", "ingredient2", "additional_ingredients_needed"],
-      "instructions": ["step1", "step2", "step3"],
-      "cookingTime": "X minutes",
-      "difficulty": "Easy/Medium/Hard",
-      "nutrition": {{
-        "calories": X,
-        "protein": "Xg",
-        "carbs": "Xg"
-      }}
-    }}
-  ]
-}}
-
-Important: Return ONLY the JSON response, no additional text or explanations.
-"""
-        return prompt
+        return _PROMPT_TEMPLATE.format(ingredients=", ".join(ingredients))
     
     def _parse_ai_response(self, response_text: str) -> List[Recipe]:
         """Parse the AI response and extract recipe data"""
         try:
-            # Clean the response text
-            cleaned_text = response_text.strip()
-            
-            # Try to find JSON content if there's extra text
-            if "```json" in cleaned_text:
-                start = cleaned_text.find("```json") + 7
-                end = cleaned_text.rfind("```")
-                cleaned_text = cleaned_text[start:end].strip()
-            elif "```" in cleaned_text:
-                start = cleaned_text.find("```") + 3
-                end = cleaned_text.rfind("```")
-                cleaned_text = cleaned_text[start:end].strip()
+            # Pull the JSON out of a fenced block if the model added one
+            match = _FENCE_RE.search(response_text)
+            cleaned_text = match.group(1) if match else response_text.strip()
             
             # Parse JSON
-            data = json.loads(cleaned_text)
+            data = orjson.loads(cleaned_text)
             
-            # Validate and convert to Recipe objects
+            # Convert to Recipe objects; the payload follows our own prompt format,
+            # so only a cheap shape check is done before skipping full validation
             recipes = []
             for recipe_data in data.get("recipes", []):
                 try:
-                    recipe = Recipe(**recipe_data)
+                    if not _has_recipe_shape(recipe_data):
+                        raise ValueError("recipe has missing or mistyped fields")
+                    kept = {field: recipe_data[field] for field in _RECIPE_FIELDS}
+                    # Nutrition is small and its calories need int coercion, so validate it fully
+                    kept["nutrition"] = NutritionInfo.model_validate(recipe_data["nutrition"])
+                    recipe = Recipe.model_construct(**kept)
                     recipes.append(recipe)
                 except Exception as e:
-                    print(f"Warning: Skipping invalid recipe: {e}")
+                    logger.warning("Skipping invalid recipe: %s", e)
                     continue
             
             return recipes
             
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {e}")
-            print(f"Raw response: {response_text}")
+        except (orjson.JSONDecodeError, json.JSONDecodeError) as e:
+            logger.warning("JSON parsing error: %s", e)
+            logger.debug("raw response length=%d", len(response_text))
             raise ValueError("Failed to parse AI response as JSON")
         except Exception as e:
-            print(f"Error parsing AI response: {e}")
+            logger.warning("Error parsing AI response: %s", e)
             raise ValueError(f"Failed to process AI response: {str(e)}")
     
     def test_connection(self) -> bool:
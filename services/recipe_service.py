@@ -1,12 +1,22 @@
-from typing import List, Optional
+import asyncio
+import functools
+from collections import OrderedDict
+from typing import Dict, List, Optional
 from models import Recipe, RecipeRequest, RecipeResponse, ErrorResponse
 from services.gemini_service import GeminiService
+from services.storage_service import StorageService
 
 class RecipeService:
     """Service for handling recipe-related business logic"""
     
-    def __init__(self):
-        self.gemini_service = GeminiService()
+    def __init__(self, storage: Optional[StorageService] = None, cache_size: int = 256):
+        self.gemini_service = GeminiService(storage)
+        # LRU cache of successful responses keyed on the ingredient set
+        self._cache: "OrderedDict[frozenset, RecipeResponse]" = OrderedDict()
+        self._cache_max = cache_size
+        # Gemini call in progress per ingredient set; concurrent identical
+        # requests await the same task and share its result, success or failure
+        self._inflight: Dict[frozenset, asyncio.Task] = {}
     
     async def generate_recipes_from_ingredients(self, request: RecipeRequest) -> RecipeResponse:
         """Generate recipes based on available ingredients"""
@@ -19,30 +29,26 @@ class RecipeService:
                     message="No ingredients provided"
                 )
             
-            # Check if we have at least one valid ingredient
-            valid_ingredients = [ing for ing in request.ingredients if ing.strip()]
-            if not valid_ingredients:
-                return RecipeResponse(
-                    recipes=[],
-                    success=False,
-                    message="No valid ingredients found"
-                )
-            
-            # Generate recipes using Gemini AI
-            response = self.gemini_service.generate_recipes(valid_ingredients)
+            # RecipeRequest has already stripped, lowercased and filtered these
+            valid_ingredients = request.ingredients
             
-            # If generation failed, return error
-            if not response.success:
-                return response
+            key = frozenset(valid_ingredients)
+            cached = self._get_cached(key)
+            if cached is not None:
+                self._record_cache_hit(valid_ingredients, cached)
+                return cached
             
-            # Validate that we got some recipes
-            if not response.recipes:
-                return RecipeResponse(
-                    recipes=[],
-                    success=False,
-                    message="No recipes could be generated with the provided ingredients"
-                )
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._generate(key, valid_ingredients))
+                self._inflight[key] = task
+                task.add_done_callback(functools.partial(self._clear_inflight, key))
+                # Shielded so a disconnecting client does not cancel the call for the others
+                return (await asyncio.shield(task)).model_copy()
             
+            # Joined a call started by another request; it logged the interaction once
+            response = (await asyncio.shield(task)).model_copy()
+            self._record_cache_hit(valid_ingredients, response)
             return response
             
         except Exception as e:
@@ -52,30 +58,60 @@ class RecipeService:
                 message=f"An error occurred while generating recipes: {str(e)}"
             )
     
-    def validate_ingredients(self, ingredients: List[str]) -> tuple[bool, Optional[str]]:
-        """Validate ingredients list"""
-        if not ingredients:
-            return False, "Ingredients list cannot be empty"
+    async def _generate(self, key: frozenset, ingredients: List[str]) -> RecipeResponse:
+        """Call Gemini for one ingredient set and cache the response if it succeeded"""
+        # Generate recipes using Gemini AI; the client call is blocking,
+        # so run it in a worker thread to keep the event loop free
+        response = await asyncio.to_thread(self.gemini_service.generate_recipes, ingredients)
         
-        if len(ingredients) < 1:
-            return False, "At least one ingredient is required"
+        # If generation failed, return error
+        if not response.success:
+            return response
         
-        # Check for very long ingredient names
-        for ingredient in ingredients:
-            if len(ingredient.strip()) > 100:
-                return False, f"Ingredient '{ingredient}' is too long"
+        # Validate that we got some recipes
+        if not response.recipes:
+            return RecipeResponse(
+                recipes=[],
+                success=False,
+                message="No recipes could be generated with the provided ingredients"
+            )
         
-        return True, None
+        self._store_cached(key, response)
+        return response
+    
+    def _clear_inflight(self, key: frozenset, task: asyncio.Task) -> None:
+        """Forget a finished Gemini call so the next request for the key starts a new one"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark any error as retrieved; every awaiting request has already handled it
+            task.exception()
+    
+    def _get_cached(self, key: frozenset) -> Optional[RecipeResponse]:
+        """Return a copy of a cached response and mark it most recently used"""
+        response = self._cache.get(key)
+        if response is None:
+            return None
+        self._cache.move_to_end(key)
+        return response.model_copy()
+    
+    def _store_cached(self, key: frozenset, response: RecipeResponse) -> None:
+        """Cache a successful response, evicting the least recently used entry"""
+        self._cache[key] = response
+        self._cache.move_to_end(key)
+        if len(self._cache) > self._cache_max:
+            self._cache.popitem(last=False)
     
-    def sanitize_ingredients(self, ingredients: List[str]) -> List[str]:
-        """Clean and normalize ingredient names"""
-        sanitized = []
-        for ingredient in ingredients:
-            # Remove extra whitespace and convert to lowercase
-            cleaned = ingredient.strip().lower()
-            if cleaned and len(cleaned) <= 100:
-                sanitized.append(cleaned)
-        return sanitized
+    def _record_cache_hit(self, ingredients: List[str], response: RecipeResponse) -> None:
+        """Log a request answered without its own Gemini call so the interaction history stays complete"""
+        self.gemini_service.storage.store_interaction(
+            user_ingredients=ingredients,
+            llm_response="",
+            parsed_recipes=[recipe.model_dump() for recipe in response.recipes],
+            success=response.success,
+            error_message=None if response.success else response.message,
+            cached=True
+        )
     
     def get_recipe_summary(self, recipes: List[Recipe]) -> dict:
         """Get a summary of generated recipes"""
@@ -1,35 +1,148 @@
-import json
+import asyncio
+import itertools
+import logging
 import os
+import threading
+import time
+from collections import deque
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 
+import orjson
+
+logger = logging.getLogger("axium")
+
+# Serializes appends so concurrent writers never interleave partial lines
+_write_lock = threading.Lock()
+
+# Process-wide sequence number that keeps interaction IDs unique
+_id_counter = itertools.count()
+
+# (epoch second, "YYYY-mm-ddTHH:MM:SS") for the last second formatted
+_timestamp_cache = (None, "")
+
+def _current_timestamp() -> str:
+    """Return the current local time in ISO format, reformatting at most once per second"""
+    global _timestamp_cache
+    sec, ns = divmod(time.time_ns(), 1_000_000_000)
+    cached_sec, iso = _timestamp_cache
+    if sec != cached_sec:
+        t = time.localtime(sec)
+        iso = f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d}T{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}"
+        _timestamp_cache = (sec, iso)
+    return f"{iso}.{ns // 1000:06d}"
+
 class StorageService:
-    """Service for storing user inputs and LLM outputs in JSON format"""
+    """Service for storing user inputs and LLM outputs in JSON Lines format"""
     
-    def __init__(self, storage_file: str = "recipe_interactions.json"):
+    def __init__(self, storage_file: str = "recipe_interactions.jsonl"):
         self.storage_file = storage_file
-        self.ensure_storage_file_exists()
+        # Byte offset of each stored interaction, keyed by interaction ID
+        self._index: Dict[str, int] = {}
+        # Number of bytes of the storage file covered by the index
+        self._indexed_size = 0
+        # Running totals over every indexed interaction
+        self._stats = {"total": 0, "success": 0, "failed": 0, "recipes": 0}
+        self._index_lock = threading.Lock()
+        self._refresh_index()
+        # Background write batching; until start_flusher() runs, writes are synchronous
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher_task: Optional[asyncio.Task] = None
+        # (interaction, serialized line) pairs taken off the queue but not yet
+        # written, and the write in progress
+        self._batch: List[Tuple[Dict, bytes]] = []
+        self._write_future: Optional[asyncio.Future] = None
     
-    def ensure_storage_file_exists(self):
-        """Create storage file if it doesn't exist"""
-        if not os.path.exists(self.storage_file):
-            with open(self.storage_file, 'w', encoding='utf-8') as f:
-                json.dump({"interactions": []}, f, indent=2)
+    def start_flusher(self, batch_size: int = 64, retry_delay: float = 1.0) -> asyncio.Task:
+        """Start a background task on the running loop that writes queued interactions in batches"""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._flusher_task = self._loop.create_task(self._flusher(batch_size, retry_delay))
+        return self._flusher_task
+    
+    async def stop_flusher(self):
+        """Stop the background task and write out anything still queued"""
+        if self._flusher_task is None:
+            return
+        self._flusher_task.cancel()
+        try:
+            await self._flusher_task
+        except (asyncio.CancelledError, Exception):
+            logger.debug("Interaction flusher stopped", exc_info=True)
+        
+        # A batch write may still be running in its thread; let it finish first
+        if self._write_future is not None:
+            try:
+                await self._write_future
+                self._batch = []
+            except OSError:
+                # The batch stays pending and is written below
+                pass
+            except Exception:
+                logger.exception("Dropping %d interactions that could not be written to %s",
+                                 len(self._batch), self.storage_file)
+                self._batch = []
+        
+        pending = self._batch
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        if pending:
+            try:
+                self._write_batch(pending)
+            except Exception:
+                logger.exception("Failed to write %d queued interactions to %s",
+                                 len(pending), self.storage_file)
+        
+        self._loop = None
+        self._queue = None
+        self._flusher_task = None
+        self._batch = []
+        self._write_future = None
+    
+    async def _flusher(self, batch_size: int, retry_delay: float):
+        """Drain the write queue, appending everything available in one write"""
+        while True:
+            if not self._batch:
+                self._batch.append(await self._queue.get())
+            while len(self._batch) < batch_size and not self._queue.empty():
+                self._batch.append(self._queue.get_nowait())
+            
+            # Shielded so cancelling the task never abandons a write midway;
+            # stop_flusher waits on the future before draining
+            self._write_future = asyncio.ensure_future(
+                asyncio.to_thread(self._write_batch, list(self._batch))
+            )
+            try:
+                await asyncio.shield(self._write_future)
+            except OSError:
+                # Keep the batch and retry so a transient I/O failure loses nothing
+                logger.exception("Failed to write %d interactions to %s; retrying in %.1fs",
+                                 len(self._batch), self.storage_file, retry_delay)
+                await asyncio.sleep(retry_delay)
+                continue
+            except Exception:
+                # Not an I/O problem, so retrying would never succeed
+                logger.exception("Dropping %d interactions that could not be written to %s",
+                                 len(self._batch), self.storage_file)
+            self._batch = []
+            self._write_future = None
     
     def store_interaction(self, 
                          user_ingredients: List[str], 
                          llm_response: str, 
                          parsed_recipes: List[Dict], 
                          success: bool,
-                         error_message: str = None) -> str:
+                         error_message: str = None,
+                         cached: bool = False) -> str:
         """Store a complete user interaction with LLM"""
         
         interaction_id = self.generate_interaction_id()
         
         interaction_data = {
             "interaction_id": interaction_id,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _current_timestamp(),
             "user_input": {
                 "ingredients": user_ingredients,
                 "ingredient_count": len(user_ingredients)
@@ -46,64 +159,177 @@ class StorageService:
             },
             "metadata": {
                 "error_message": error_message,
-                "processing_status": "success" if success else "failed"
+                "processing_status": "failed" if not success else "cached" if cached else "success"
             }
         }
         
-        # Load existing data
-        with open(self.storage_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Add new interaction
-        data["interactions"].append(interaction_data)
+        # Serialize here so a record that cannot be encoded fails its own caller
+        # instead of blocking the write queue
+        entry = (interaction_data, orjson.dumps(interaction_data, option=orjson.OPT_APPEND_NEWLINE))
         
-        # Save updated data
-        with open(self.storage_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        
-        print(f"💾 StorageService - Interaction {interaction_id} stored successfully")
+        if self._queue is None:
+            self._write_batch([entry])
+            logger.debug("Interaction %s stored", interaction_id)
+        else:
+            # Callers may run in worker threads, so hand off to the loop thread-safely
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, entry)
+            logger.debug("Interaction %s queued for storage", interaction_id)
         return interaction_id
     
+    def _write_batch(self, entries: List[Tuple[Dict, bytes]]):
+        """Append serialized interactions in a single write (the file is created on first write)"""
+        data = b"".join(line for _, line in entries)
+        with _write_lock:
+            # Unbuffered, so a failed write leaves no data behind to be flushed on close
+            with open(self.storage_file, 'ab', buffering=0) as f:
+                start = f.seek(0, os.SEEK_END)
+                written = 0
+                try:
+                    while written < len(data):
+                        written += f.write(data[written:])
+                except OSError:
+                    # Roll back a partial append so the retried batch is not duplicated,
+                    # unless another process has appended after us in the meantime
+                    if written and os.fstat(f.fileno()).st_size == start + written:
+                        f.truncate(start)
+                    raise
+                end = f.tell()
+            with self._index_lock:
+                # Only extend the index if nothing was appended behind our back;
+                # otherwise the next refresh picks up every new line in order
+                if end - len(data) == self._indexed_size:
+                    offset = self._indexed_size
+                    for interaction, line in entries:
+                        self._index_record(interaction, offset)
+                        offset += len(line)
+                    self._indexed_size = end
+    
     def generate_interaction_id(self) -> str:
         """Generate a unique interaction ID"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        return f"recipe_interaction_{timestamp}"
+        # Nanosecond clock orders IDs by creation time; the counter breaks ties
+        return f"ri_{time.time_ns():x}_{next(_id_counter):x}"
     
     def get_all_interactions(self) -> List[Dict]:
         """Retrieve all stored interactions"""
+        return list(self._iter_interactions())
+    
+    def _iter_interactions(self):
+        """Yield every well-formed interaction in file order"""
         try:
-            with open(self.storage_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get("interactions", [])
+            with open(self.storage_file, 'rb') as f:
+                for line in f:
+                    interaction = self._load_line(line)
+                    if interaction is not None:
+                        yield interaction
         except FileNotFoundError:
-            return []
+            return
+    
+    def _load_line(self, line: bytes) -> Optional[Dict]:
+        """Parse one log line, returning None for blank, partial or malformed lines"""
+        if not line.endswith(b"\n") or not line.strip():
+            # Blank, or a partially written last line that the index also ignores
+            return None
+        try:
+            interaction = orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            logger.warning("Skipping malformed interaction in %s: %r", self.storage_file, e)
+            return None
+        if not isinstance(interaction, dict):
+            logger.warning("Skipping malformed interaction in %s: expected an object, got %s",
+                           self.storage_file, type(interaction).__name__)
+            return None
+        return interaction
     
     def get_interaction_by_id(self, interaction_id: str) -> Dict:
         """Retrieve a specific interaction by ID"""
-        interactions = self.get_all_interactions()
-        for interaction in interactions:
-            if interaction.get("interaction_id") == interaction_id:
-                return interaction
-        return None
+        self._refresh_index()
+        offset = self._index.get(interaction_id)
+        if offset is None:
+            return None
+        with open(self.storage_file, 'rb') as f:
+            f.seek(offset)
+            return orjson.loads(f.readline())
+    
+    def _refresh_index(self):
+        """Index any interactions appended to the storage file since the last scan"""
+        with self._index_lock:
+            try:
+                with open(self.storage_file, 'rb') as f:
+                    if os.fstat(f.fileno()).st_size < self._indexed_size:
+                        # File was truncated or replaced; rebuild from scratch
+                        self._reset_index()
+                    f.seek(self._indexed_size)
+                    offset = self._indexed_size
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            # Partially written line; it is indexed on a later refresh
+                            break
+                        if line.strip():
+                            try:
+                                self._index_record(orjson.loads(line), offset)
+                            except (orjson.JSONDecodeError, KeyError, TypeError) as e:
+                                logger.warning("Skipping malformed interaction at byte %d of %s: %r",
+                                               offset, self.storage_file, e)
+                        offset += len(line)
+                    self._indexed_size = offset
+            except FileNotFoundError:
+                self._reset_index()
+    
+    def _reset_index(self):
+        """Drop the index and running totals"""
+        self._index.clear()
+        self._indexed_size = 0
+        for key in self._stats:
+            self._stats[key] = 0
+    
+    def _index_record(self, interaction: Dict, offset: int):
+        """Add a single interaction located at the given byte offset to the index"""
+        if not isinstance(interaction, dict):
+            raise TypeError(f"expected an object, got {type(interaction).__name__}")
+        parsed_output = interaction.get("parsed_output") or {}
+        if not isinstance(parsed_output, dict):
+            raise TypeError(f"parsed_output must be an object, got {type(parsed_output).__name__}")
+        recipe_count = parsed_output.get("recipe_count") or 0
+        if not isinstance(recipe_count, int):
+            raise TypeError(f"recipe_count must be an integer, got {type(recipe_count).__name__}")
+        
+        interaction_id = interaction.get("interaction_id")
+        if interaction_id is not None:
+            # Keep the first occurrence so duplicate IDs resolve like a forward scan
+            self._index.setdefault(interaction_id, offset)
+        
+        self._stats["total"] += 1
+        self._stats["success" if parsed_output.get("success") else "failed"] += 1
+        self._stats["recipes"] += recipe_count
     
     def get_recent_interactions(self, limit: int = 10) -> List[Dict]:
         """Get the most recent interactions"""
-        interactions = self.get_all_interactions()
-        return interactions[-limit:] if interactions else []
+        if limit <= 0:
+            return []
+        try:
+            with open(self.storage_file, 'rb') as f:
+                # Only the last `limit` lines are kept in memory while scanning
+                lines = deque((line for line in f if line.strip()), maxlen=limit)
+        except FileNotFoundError:
+            return []
+        interactions = [self._load_line(line) for line in lines]
+        if None in interactions:
+            # Bad lines fell inside the window; rescan so `limit` good records come back
+            return list(deque(self._iter_interactions(), maxlen=limit))
+        return interactions
     
     def get_storage_stats(self) -> Dict:
         """Get statistics about stored data"""
-        interactions = self.get_all_interactions()
+        self._refresh_index()
+        with self._index_lock:
+            total_interactions = self._stats["total"]
+            successful_interactions = self._stats["success"]
+            failed_interactions = self._stats["failed"]
+            total_recipes_generated = self._stats["recipes"]
         
-        if not interactions:
+        if not total_interactions:
             return {"total_interactions": 0}
         
-        total_interactions = len(interactions)
-        successful_interactions = sum(1 for i in interactions if i["parsed_output"]["success"])
-        failed_interactions = total_interactions - successful_interactions
-        
-        total_recipes_generated = sum(i["parsed_output"]["recipe_count"] for i in interactions)
-        
         return {
             "total_interactions": total_interactions,
             "successful_interactions": successful_interactions,
@@ -132,8 +358,8 @@ class StorageService:
             "interactions": interactions
         }
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, indent=2, ensure_ascii=False)
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(export_data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
         
         print(f"📤 StorageService - Exported {len(interactions)} interactions to {filename}")
         return filename